@@ -21,19 +21,123 @@ wikis_migration.py path_to_trac_env path_to_new_wikis_folder
 """
 
 import argparse
+import concurrent.futures
+import contextlib
+import dataclasses
 import datetime
 import fnmatch
+import functools
 import importlib
 import os
 import re
 import sqlite3
 import shutil
+from typing import Iterable, Iterator, Optional, Union, cast
+
+import trac.attachment  # type: ignore[import-untyped]
+import trac.env  # type: ignore[import-untyped]
+
+
+# Patterns are compiled once at import, since every wiki goes through all of them
+_PREPROCESSING_RE = re.compile(r'\[\[(?:PageOutline|Emails|BR|br|TicketQuery\(.+?\))\]\]')
+_PREPROCESSING_REPLACEMENTS = {
+    '[[PageOutline]]': '',
+    '[[Emails]]': '',
+    '[[BR]]': '\n',
+    '[[br]]': '\n',
+}
+_TITLE_INDEX_RE = re.compile(r'\[\[TitleIndex\((.+?/?)\)\]\]')
+_LOG_RE = re.compile(r'\[log:(.+?) (.+?)\]')
+_SOURCE_DOCS_RE = re.compile(
+    r'(?s:\[source:"+docs/(?P<quotes_path>.+?)"+\s(?P<quotes_text>.+?)\])'
+    r'|(?s:\[source:docs/(?P<brackets_path>.+?)\s(?P<brackets_text>.+?)\])'
+    r'|source:docs/(?P<no_brackets_path>.+?)(?P<no_brackets_text>\.?\s)'
+)
+_SOURCE_RE = re.compile(
+    r'\[source:(?P<source_title_path>.+?)\ (?P<source_title>.+?)]'
+    r'|\[source:(?P<source_brackets_path>.+?)\]'
+    r'|(?<!\[)source:(?P<source_no_brackets_path>.+?)\s'
+)
+_WIKI_RE = re.compile(
+    r'\[wiki:(?P<brackets_text_name>[\w\d/]+)\s(?P<brackets_text>.+?)\]'
+    r'|\[wiki:(?P<brackets_name>[\w\d/]+?)\]'
+    r'|(?<!\[)wiki:(?P<no_brackets_name>[\w\d/]+)'
+)
+_REPORT_RE = re.compile(r'\[report:\d+ (?P<report_text>.+?)\]')
+_TICKET_RE = re.compile(r'#(?P<ticket_number>\d+)')
+# Source, ticket, report and wiki links matched in a single pass by format_references.
+# The group names of the patterns above are unique, so they can be reused here. The
+# lookahead on the first character skips trying every alternative at every position.
+_REFERENCES_RE = re.compile(r'(?=[\[#sw])(?:' + '|'.join(
+    f'(?P<{name}>{pattern.pattern})'
+    for name, pattern in (('source', _SOURCE_RE), ('ticket', _TICKET_RE), ('report', _REPORT_RE), ('wiki', _WIKI_RE))
+) + ')')
+_IMAGE_RE = re.compile(r'\[\[Image\((.+?\.\w+)(\,\w+)?\)\]\]')
+_UNORDERED_LIST_RE = re.compile(r'(?<!\*)\* (.+)\n')
+_TABLE_HEADER_RE = re.compile(r"(\|\|\s*'''.+'''\s*\|\|)", re.MULTILINE)
+_LINK_RE = re.compile(r'\[((https?|www).+?)\s(.+?)\]')
+_UNDERLINE_RE = re.compile(r'__(.+?)__')
+_BOLD_RE = re.compile(r"'''\s*(.+?)\s*'''")
+_ITALIC_QUOTES_RE = re.compile(r"''(.+?)''")
+# Matches only if : doesn't preceed //, to avoid formatting https:// as italic
+_ITALIC_SLASHES_RE = re.compile(r'(?<!:)//(.+?)//')
+_CODE_LANGUAGE_RE = re.compile(r'\s*\{\{\{\s*#!(sql|html|c#|python|xml)')
+_CODE_OPEN_RE = re.compile(r'\{\{\{')
+_CODE_CLOSE_RE = re.compile(r'\}\}\}')
+_HORIZONTAL_RE = re.compile(r'^[^\S\n]*-----*[^\S\n]*$', re.MULTILINE)
+# Header level, header text, then the optional closing = and #anchor, all on one line
+_HEADER_RE = re.compile(r'^(={1,4})[^\S\n]+([^=\n]+?)[^\S\n]*(?:=+[^\S\n]*(?:#.*)?)?[^\S\n]*$', re.MULTILINE)
+
+
+# Wiki object containing name, max version, and text
+Wiki = tuple[str, int, str]
+
+
+@dataclasses.dataclass(frozen=True)
+class Links:
+    """
+    Base urls used by the link formatting functions,
+    built once from your organization's Trac links.
+
+    Attributes:
+        wiki (str): Base url of Trac wikis
+        ticket (str): Base url of Trac tickets
+        report (str): Base url of Trac reports
+        browser (str): Base url of the Trac source code browser
+        log (str): Base url of code logs
+        docs (str): Base url of documents
+    """
+    wiki: str
+    ticket: str
+    report: str
+    browser: str
+    log: str
+    docs: str
+
+    @classmethod
+    def from_config(cls, trac_link: str, docs_link: str, code_link: str) -> 'Links':
+        """
+        Builds all base urls from the links in the config file.
 
-import trac.attachment
-import trac.env
+        Args:
+            trac_link (str): Your organization's base Trac link
+            docs_link (str): Your organization's Trac docs link
+            code_link (str): Your organization's Trac code link
 
+        Returns:
+            links (Links): Base urls for the link formatting functions
+        """
+        return cls(
+            wiki=f'https://{trac_link}/wiki/',
+            ticket=f'https://{trac_link}/ticket/',
+            report=f'https://{trac_link}/report/',
+            browser=f'https://{trac_link}/browser/',
+            log=f'https://{code_link}/',
+            docs=f'https://{docs_link}/',
+        )
 
-def preprocessing(text):
+
+def preprocessing(text: str) -> str:
     """
     Preprocesses the text before sending it to the format functions:
      - to avoid misinterpretation by the regex methods
@@ -55,23 +159,20 @@ def preprocessing(text):
     Returns:
         text (str): Preprocessed text
     """
+    # str.replace is kept over str.translate, which is many times
+    # slower when a character maps to a longer string
     text = text.replace('\\', '\\\\')
 
-    text = text.replace('[[PageOutline]]', '')
-    text = text.replace('[[Emails]]', '')
-    
-    if text[0] == '"' and text[-1] == '"':
-        text = text[1:-1]
+    # Any match missing from the replacements is a [[TicketQuery(...)]], which is removed
+    text = _PREPROCESSING_RE.sub(lambda m: _PREPROCESSING_REPLACEMENTS.get(m.group(), ''), text)
 
-    text = text.replace('[[BR]]', '\n')
-    text = text.replace('[[br]]', '\n')
-
-    text = re.sub(r'\[\[TicketQuery\(.+?\)\]\]', '', text)
+    if text and text[0] == '"' and text[-1] == '"':
+        text = text[1:-1]
 
     return text
 
 
-def postprocessing(text):
+def postprocessing(text: str) -> str:
     """
     Replaces all double backtics with single backticks
     after all formatting is finished, to ensure proper
@@ -87,7 +188,26 @@ def postprocessing(text):
     return text
     
 
-def format_title_index(text, env_path, trac_link):
+def _get_subpages(cursor: sqlite3.Cursor, title: str) -> tuple[str, ...]:
+    """
+    Returns the names of all wikis starting with the given title.
+    """
+    subpages_query = """
+        select distinct name
+        from wiki
+        where name like ?
+    """
+    result = cursor.execute(subpages_query, (title + '%',)).fetchall()
+
+    return tuple(page[0] for page in result)
+
+
+def format_title_index(
+    text: str,
+    cursor: sqlite3.Cursor,
+    links: Links,
+    subpages_cache: Optional[dict[str, tuple[str, ...]]] = None,
+) -> str:
     """
     Formats TitleIndex Trac referencing in provided
     text string by replacing it with hyperlinks
@@ -101,43 +221,32 @@ def format_title_index(text, env_path, trac_link):
 
     Args:
         text (str): Text in Trac markdown to be formatted
-        env_path (str): Path to Trac environment
-        trac_link (str): Your organization's base Trac link
+        cursor (sqlite3.Cursor): Cursor to the Trac database
+        links (Links): Your organization's Trac links
+        subpages_cache (dict of {str : tuple}, optional): Subpages of already indexed
+                                                          titles, shared between calls
 
     Returns:
         text (str): Formatted text in standard markdown
     """
-    title_index_pattern = r'\[\[TitleIndex\((.+?/?)\)\]\]'
-    match = re.findall(title_index_pattern, text)
+    if subpages_cache is None:
+        subpages_cache = {}
 
-    base_link = f'https://{trac_link}/wiki/'
-
-    database_connection = sqlite3.connect(f'{env_path}\\db\\trac.db')
-    cursor = database_connection.cursor()
-
-    for m in match:
-        subpages = []
-        subpages_query = f"""
-            select distinct name
-            from wiki
-            where name like '{m}%'
-        """
-        result = cursor.execute(subpages_query).fetchall()
+    def replacement(m: re.Match[str]) -> str:
+        title = m.group(1)
 
-        for page in result:
-            subpages.append(page[0])
+        if title not in subpages_cache:
+            subpages_cache[title] = _get_subpages(cursor, title)
 
-        replacement = ''
-        for page in subpages:
-            page_link = base_link + page
-            replacement += f'- [{page}]({page_link})\n'
+        subpages = subpages_cache[title]
+        return ''.join(f'- [{page}]({links.wiki}{page})\n' for page in subpages)
 
-        text = re.sub(title_index_pattern, replacement, text, 1)
+    text = _TITLE_INDEX_RE.sub(replacement, text)
 
     return text
 
 
-def format_log_links(text, code_link):
+def format_log_links(text: str, links: Links) -> str:
     """
     Formats code log references from Trac source
     code browser using the base code log url.
@@ -147,35 +256,41 @@ def format_log_links(text, code_link):
 
     Args:
         text (str): Text in Trac markdown to be formatted
-        code_link (str): Your organization's Trac code link
+        links (Links): Your organization's Trac links
 
     Returns:
         text (str): Formatted text in standard markdown
     """
-    log_pattern = r'\[log:(.+?) (.+?)\]'
-    match = re.findall(log_pattern, text)
-
-    base_link = f'https://{code_link}/'
-
-    for m in match:
-        url = m[0]
-        log_text = m[1]
+    def replacement(m: re.Match[str]) -> str:
+        url, log_text = m.groups()
 
         if ':' in url:
             url = url.replace('@', '?revs=')
             url = url.replace(':', '-')
-            log_link = base_link + url
         else:
             url = url.replace('@', '?rev=')
-            log_link = base_link + url
 
-        replacement = f'[{log_text}]({log_link})'
-        text = re.sub(log_pattern, replacement, text, 1)
+        return f'[{log_text}]({links.log}{url})'
+
+    text = _LOG_RE.sub(replacement, text)
 
     return text
 
 
-def format_source_docs(text, docs_link):
+def _replace_source_docs_link(m: re.Match[str], base_link: str) -> str:
+    """
+    Returns the standard markdown link for a match of _SOURCE_DOCS_RE.
+    """
+    url = base_link + (m['quotes_path'] or m['brackets_path'] or m['no_brackets_path'])
+    docs_text = m['quotes_text'] or m['brackets_text'] or m['no_brackets_text']
+
+    if docs_text not in ['', '. ', ' ', '.\r']:
+        return f'[{docs_text}]({url})'
+
+    return f'[document]({url}){docs_text}'
+
+
+def format_source_docs(text: str, links: Links) -> str:
     """
     Formats source document references from
     Trac docs broswer using the base docs url.
@@ -188,43 +303,30 @@ def format_source_docs(text, docs_link):
 
     Args:
         text (str): Text in Trac markdown to be formatted
-        docs_link (str): Your organization's Trac docs link 
+        links (Links): Your organization's Trac links
 
     Returns:
         text (str): Formatted text in standard markdown
     """
-    source_pattern_brackets = r'\[source:docs/(.+?)\s(.+?)\]'
-    source_pattern_quotes = r'\[source:"+docs/(.+?)"+\s(.+?)\]'
-    source_pattern_no_brackets = r'source:docs/(.+?)(\.?\s)'
+    text = _SOURCE_DOCS_RE.sub(functools.partial(_replace_source_docs_link, base_link=links.docs), text)
 
-    match_quotes = re.findall(source_pattern_quotes, text, re.DOTALL)
-    match_brackets = re.findall(source_pattern_brackets, text, re.DOTALL)
-    match_no_brackets = re.findall(source_pattern_no_brackets, text)
-
-    base_link = f'https://{docs_link}/'
-
-    all_matches = match_brackets + match_no_brackets + match_quotes
+    return text
 
-    for m in all_matches:
-        url = base_link + r'\1'
-        docs_text = m[1]
 
-        if docs_text not in ['', '. ', ' ', '.\r']:
-            replacement = f'[{docs_text}]({url})'
-        else:
-            replacement = f'[document]({url})\\2'
+def _replace_source_link(m: re.Match[str], base_link: str) -> str:
+    """
+    Returns the standard markdown link for a match of _SOURCE_RE.
+    """
+    if m['source_title_path']:
+        return f"[{m['source_title']}]({base_link}{m['source_title_path']})"
 
-        if m in match_brackets:
-            text = re.sub(source_pattern_brackets, replacement, text, 1)
-        elif m in match_quotes:
-            text = re.sub(source_pattern_quotes, replacement, text, 1)
-        elif m in match_no_brackets:
-            text = re.sub(source_pattern_no_brackets, replacement, text, 1)
+    if m['source_brackets_path']:
+        return f"[{m['source_brackets_path']}]({base_link}{m['source_brackets_path']})"
 
-    return text
+    return f"[source:{m['source_no_brackets_path']}]({base_link}{m['source_no_brackets_path']}) "
 
 
-def format_source_links(text, trac_link):
+def format_source_links(text: str, links: Links) -> str:
     """
     Formats `source:/` style links to regular
     Markdown links to the Trac source code browser. 
@@ -236,31 +338,30 @@ def format_source_links(text, trac_link):
 
     Args:
         text (str): Trac text to be formatted
-        trac_link (str): Your organization's base Trac link
+        links (Links): Your organization's Trac links
 
     Returns:
         text (str): Text with various versions of Trac source:/
                     format changed to standard Markdown URLs
     """
-    base_link = f'https://{trac_link}/browser/'
-
-    wiki_pattern_brackets_title = r'\[source:(.+?)\ (.+?)]'
-    wiki_pattern_brackets_title_replace = rf"[\2]({base_link}\1)"
+    replacement = functools.partial(_replace_source_link, base_link=links.browser)
+    text = _SOURCE_RE.sub(replacement, text)
 
-    wiki_pattern_brackets = r'\[source:(.+?)\]'
-    wiki_pattern_brackets_replace = rf"[\1]({base_link}\1)"
+    return text
 
-    wiki_pattern_base = r'(?<!\[)source:(.+?)\s'
-    wiki_pattern_base_replace = rf'[source:\1]({base_link}\1) '
 
-    text = re.sub(wiki_pattern_brackets_title, wiki_pattern_brackets_title_replace, text)
-    text = re.sub(wiki_pattern_brackets, wiki_pattern_brackets_replace, text)
-    text = re.sub(wiki_pattern_base, wiki_pattern_base_replace, text)
+def _replace_wiki_link(m: re.Match[str], base_link: str) -> str:
+    """
+    Returns the standard markdown link for a match of _WIKI_RE.
+    """
+    if m['brackets_text_name']:
+        return f"[{m['brackets_text']}]({base_link}{m['brackets_text_name']})"
 
-    return text
+    wiki_name = m['brackets_name'] or m['no_brackets_name']
+    return f'[{wiki_name}]({base_link}{wiki_name})'
 
 
-def format_wiki_links(text, trac_link):
+def format_wiki_links(text: str, links: Links) -> str:
     """
     Formats automatic Trac wiki links as 
     regular links using the base wiki url.
@@ -271,39 +372,25 @@ def format_wiki_links(text, trac_link):
 
     Args:
         text (str): Text in Trac markdown to be formatted
-        trac_link (str): Your organization's base Trac link
+        links (Links): Your organization's Trac links
 
     Returns:
         text (str): Formatted text in standard markdown
     """
-    wiki_pattern_no_brackets = r'(?<!\[)wiki:([\w\d/]+)'
-    wiki_pattern_brackets = r'\[wiki:([\w\d/]+?)\]'
-    wiki_pattern_brackets_text = r'\[wiki:([\w\d/]+)\s(.+?)\]'
+    replacement = functools.partial(_replace_wiki_link, base_link=links.wiki)
+    text = _WIKI_RE.sub(replacement, text)
 
-    match_brackets = re.findall(wiki_pattern_brackets, text)
-    match_brackets_text = re.findall(wiki_pattern_brackets_text, text)
-    match_no_brackets = re.findall(wiki_pattern_no_brackets, text)
-
-    all_matches = match_brackets + match_no_brackets + match_brackets_text
+    return text
 
-    base_link = f'https://{trac_link}/wiki/'
-    
-    for m in all_matches:
-        wiki_link = base_link + r'\1'
-        if m in match_brackets:
-            replacement = fr'[\1]({wiki_link})'
-            text = re.sub(wiki_pattern_brackets, replacement, text, 1)
-        elif m in match_no_brackets:
-            replacement = fr'[\1]({wiki_link})'
-            text = re.sub(wiki_pattern_no_brackets, replacement, text, 1)
-        elif m in match_brackets_text:
-            replacement = fr'[\2]({wiki_link})'
-            text = re.sub(wiki_pattern_brackets_text, replacement, text, 1)
 
-    return text
+def _replace_report_link(m: re.Match[str], base_link: str) -> str:
+    """
+    Returns the standard markdown link for a match of _REPORT_RE.
+    """
+    return f"[{m['report_text']}]({base_link}{m['report_text']})"
 
 
-def format_report_links(text, trac_link):
+def format_report_links(text: str, links: Links) -> str:
     """
     Formats automatic Trac report links as 
     regular links using the base report url.
@@ -313,25 +400,25 @@ def format_report_links(text, trac_link):
 
     Args:
         text (str): Text in Trac markdown to be formatted
-        trac_link (str): Your organization's base Trac link
+        links (Links): Your organization's Trac links
 
     Returns:
         text (str): Formatted text in standard markdown
     """
-    report_pattern = r'\[report:\d+ (.+?)\]'
-    match = re.findall(report_pattern, text)
+    replacement = functools.partial(_replace_report_link, base_link=links.report)
+    text = _REPORT_RE.sub(replacement, text)
 
-    base_link = f'https://{trac_link}/report/'
+    return text
 
-    for m in match:
-        report_link = base_link + r'\1'
-        replacement = fr'[\1]({report_link})'
-        text = re.sub(report_pattern, replacement, text, 1)
 
-    return text
+def _replace_ticket_link(m: re.Match[str], base_link: str) -> str:
+    """
+    Returns the standard markdown link for a match of _TICKET_RE.
+    """
+    return f"[ticket:{m['ticket_number']}]({base_link}{m['ticket_number']})"
 
 
-def format_ticket_links(text, trac_link):
+def format_ticket_links(text: str, links: Links) -> str:
     """
     Formats automatic Trac ticket links as 
     regular links using the base ticket url.
@@ -341,28 +428,90 @@ def format_ticket_links(text, trac_link):
 
     Args:
         text (str): Text in Trac markdown to be formatted
-        trac_link (str): Your organization's base Trac link
+        links (Links): Your organization's Trac links
 
     Returns:
         text (str): Formatted text in standard markdown
     """
-    ticket_link_pattern = r'#(\d+)'
-    match = re.findall(ticket_link_pattern, text)
+    replacement = functools.partial(_replace_ticket_link, base_link=links.ticket)
+    text = _TICKET_RE.sub(replacement, text)
+
+    return text
+
+
+def format_references(text: str, links: Links) -> str:
+    """
+    Formats source, ticket, report, and wiki links in a
+    single pass over the text, instead of calling
+    format_source_links, format_ticket_links,
+    format_report_links, and format_wiki_links in turn.
+
+    When two references overlap, the one that starts first
+    is formatted. References that start at the same position
+    take precedence in the order listed above.
 
-    base_link = f'https://{trac_link}/ticket/'
+    Args:
+        text (str): Text in Trac markdown to be formatted
+        links (Links): Your organization's Trac links
+
+    Returns:
+        text (str): Formatted text in standard markdown
+    """
+    replacements = {
+        'source': functools.partial(_replace_source_link, base_link=links.browser),
+        'ticket': functools.partial(_replace_ticket_link, base_link=links.ticket),
+        'report': functools.partial(_replace_report_link, base_link=links.report),
+        'wiki': functools.partial(_replace_wiki_link, base_link=links.wiki),
+    }
 
-    for ticket_number in match:
-        new_link = base_link + ticket_number
-        replacement = f'[ticket:{ticket_number}]({new_link})'
-        text = re.sub(ticket_link_pattern, replacement, text, 1)
+    def replacement(m: re.Match[str]) -> str:
+        # Every alternative is a named group, so lastgroup is always set
+        return replacements[cast(str, m.lastgroup)](m)
+
+    text = _REFERENCES_RE.sub(replacement, text)
 
     return text
 
 
-def format_attachments(wiki_attachments, attachment_path, wiki_name, text):
+# Directories already created by this process, to skip repeated makedirs calls
+_created_dirs: set[str] = set()
+
+
+def _ensure_dir(directory: str) -> None:
+    """
+    Creates the directory and its parents, unless
+    this process has already created it.
+    """
+    if directory not in _created_dirs:
+        os.makedirs(directory, exist_ok=True)
+        _created_dirs.add(directory)
+
+
+# Attachments are copied by background threads while the formatting continues
+_IO_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+
+def _wait_for_copies(copy_futures: Iterable[concurrent.futures.Future[str]]) -> None:
+    """
+    Waits until all attachment copies are finished and
+    raises the first error that occurred while copying.
+    """
+    for future in concurrent.futures.as_completed(copy_futures):
+        future.result()
+
+
+def format_attachments(
+    wiki_attachments: dict[str, list[str]],
+    attachment_path: dict[str, str],
+    wiki_name: str,
+    text: str,
+    new_wikis_folder: str,
+    copy_futures: Optional[list[concurrent.futures.Future[str]]] = None,
+) -> tuple[str, dict[str, list[str]]]:
     """
     Formats wiki attachments in provided text string and
-    copies each attachment to the wiki's subfolder.
+    copies each attachment to the wiki's subfolder
+    in the Attachments folder of the new wikis folder.
 
     This function first matches an image regex and replaces
     all occurences with standard markdown syntax. Each
@@ -372,6 +521,11 @@ def format_attachments(wiki_attachments, attachment_path, wiki_name, text):
     Then the remaining non-image attachments are also copied
     to the respective wiki's subfolder in the Attachments folder.
 
+    The attachments are copied by background threads. If
+    copy_futures is given, the futures of the copies are added
+    to it and the caller must wait for them, otherwise this
+    function waits for the copies before returning.
+
     Trac markdown: [[Image(path)]]
     Standard markdown: ![alt text](path)
 
@@ -380,62 +534,62 @@ def format_attachments(wiki_attachments, attachment_path, wiki_name, text):
         attachment_path (dict of {str : str}): Path to each attachment
         wiki_name (str): Name of wiki which is currently formatted
         text (str): Text in Trac markdown to be formatted
+        new_wikis_folder (str): Path to folder for formatted wikis
+        copy_futures (list of concurrent.futures.Future, optional): Collects the pending copies
 
     Returns:
         text (str): Formatted text in standard markdown
         wiki_attachments (dict of {str : list}): Updated list of all attachments for each wiki
                                                  after they are moved to the Attachments folder
     """
-    directory = f'C:\\Users\\v.trajkosk\\infoware-trac-wiki\\Attachments\\{wiki_name}\\'
-    os.makedirs(os.path.dirname(directory), exist_ok=True)
-
-    image_pattern = r'\[\[Image\((.+?\.\w+)(\,\w+)?\)\]\]'
-    match = re.findall(image_pattern, text)
-
-    for m in match:
-        filename = m[0]
-
-        if filename not in attachment_path.keys():
-            print(f'File {filename} from wiki {wiki_name} not found in attachments')
-            continue
+    directory = os.path.join(new_wikis_folder, 'Attachments', *wiki_name.split('/'))
+    new_wiki_name = wiki_name.replace('\\', '/')
 
-        path = preprocessing(attachment_path[filename])
+    futures: dict[str, concurrent.futures.Future[str]] = {}
 
+    def copy_attachment(filename: str) -> str:
         # Removing whitespaces from filename because some systems
         # can't render attachments with whitespace in the name
         new_filename = ''.join(filename.split())
 
-        new_location = f'{directory}{new_filename}'
+        new_location = os.path.join(directory, new_filename)
+        if new_location not in futures:
+            _ensure_dir(directory)
+            futures[new_location] = _IO_POOL.submit(shutil.copyfile, attachment_path[filename], new_location)
 
-        new_wiki_name = wiki_name.replace('\\', '/')
-        new_location = f"/Attachments/{new_wiki_name}/{new_filename}"
+        return new_filename
 
-        replacement = f'![{new_filename}]({new_location})'
-        text = re.sub(image_pattern, replacement, text, 1)
+    def replacement(m: re.Match[str]) -> str:
+        filename = m.group(1)
 
-        shutil.copy(path, new_location)
+        if filename not in attachment_path:
+            print(f'File {filename} from wiki {wiki_name} not found in attachments')
+            return m.group()
+
+        new_filename = copy_attachment(filename)
 
-        if filename in wiki_attachments[wiki_name]:  
+        if filename in wiki_attachments[wiki_name]:
             wiki_attachments[wiki_name].remove(filename)
 
-    if len(wiki_attachments[wiki_name]) != 0:
-        for filename in wiki_attachments[wiki_name]:
-            path = preprocessing(attachment_path[filename])
+        return f'![{new_filename}](/Attachments/{new_wiki_name}/{new_filename})'
 
-            # Removing whitespaces from filename because some systems
-            # can't render attachments with whitespace in the name
-            new_filename = ''.join(filename.split())
+    text = _IMAGE_RE.sub(replacement, text)
 
-            new_location = f'{directory}{new_filename}'
-            replacement = f'![{new_filename}]({path})'
-            shutil.copy(path, new_location)
+    if len(wiki_attachments[wiki_name]) != 0:
+        for filename in wiki_attachments[wiki_name]:
+            copy_attachment(filename)
 
         del wiki_attachments[wiki_name]
 
+    if copy_futures is None:
+        _wait_for_copies(futures.values())
+    else:
+        copy_futures.extend(futures.values())
+
     return text, wiki_attachments
 
 
-def format_unordered_lists(text):
+def format_unordered_lists(text: str) -> str:
     """
     Formats unordered lists.
 
@@ -456,18 +610,13 @@ def format_unordered_lists(text):
     Returns:
         text (str): Formatted text in standard markdown
     """
-    unordered_list_pattern = r'(?<!\*)\* (.+)\n'
-
-    match = re.findall(unordered_list_pattern, text)
-
-    for m in match:
-        replacement = r'- \1\n'
-        text = re.sub(unordered_list_pattern, replacement, text, 1)
+    replacement = r'- \1\n'
+    text = _UNORDERED_LIST_RE.sub(replacement, text)
 
     return text
 
 
-def format_tables(text):
+def format_tables(text: str) -> str:
     """
     Formats tables by first finding the table header and 
     inserting a horizontal rule after it, and then replacing
@@ -489,26 +638,21 @@ def format_tables(text):
     Returns:
         text (str): Formatted text in standard markdown
     """
-    table_pattern = r"(\|\|\s*'''.+'''\s*\|\|)"
-
-    new_string = ''
-    rows = text.splitlines()
+    rows = []
 
-    for row in rows:
-        new_string += row + '\n'
-        if re.match(table_pattern, row, re.MULTILINE):
+    for row in text.splitlines():
+        rows.append(row)
+        if _TABLE_HEADER_RE.match(row):
             columns_count = len(row.split('||')) - 2
-            insert = '|'
-            for i in range(0, columns_count):
-                insert += ' ---- |'
-            new_string += insert + '\n'
+            rows.append('|' + ' ---- |' * columns_count)
 
+    new_string = '\n'.join(rows) + '\n' if rows else ''
     new_string = new_string.replace('||', '|')
 
     return new_string
 
 
-def format_links(text):
+def format_links(text: str) -> str:
     """
     Formats hyperlinks.
 
@@ -526,17 +670,13 @@ def format_links(text):
     Returns:
         text (str): Formatted text in standard markdown
     """
-    link_pattern = r'\[((https?|www).+?)\s(.+?)\]'
-    match = re.findall(link_pattern, text)
+    replacement = r'[\3](\1)'
+    text = _LINK_RE.sub(replacement, text)
 
-    for m in match:
-        replacement = r'[\3](\1)'
-        text = re.sub(link_pattern, replacement, text, 1)
-    
     return text
 
 
-def format_underline(text):
+def format_underline(text: str) -> str:
     """
     Formats underlined text using HTML u-tag.
 
@@ -553,17 +693,13 @@ def format_underline(text):
     Returns:
         text (str): Formatted text in HTML syntax
     """
-    underlined_pattern = r'__(.+?)__'
-    match = re.findall(underlined_pattern, text)
-
-    for m in match:
-        replacement = r'<u>\1</u>'
-        text = re.sub(underlined_pattern, replacement, text, 1)
+    replacement = r'<u>\1</u>'
+    text = _UNDERLINE_RE.sub(replacement, text)
 
     return text
 
 
-def format_bold(text):
+def format_bold(text: str) -> str:
     """
     Formats bold text.
     
@@ -581,14 +717,13 @@ def format_bold(text):
     Returns:
         text (str): Formatted text in standard markdown
     """
-    bold_header_pattern = r"'''\s*(.+?)\s*'''"
     replacement = r'**\1**'
-    text = re.sub(bold_header_pattern, replacement, text)
+    text = _BOLD_RE.sub(replacement, text)
 
     return text
 
 
-def format_italic(text):
+def format_italic(text: str) -> str:
     """
     Formats italic text.
 
@@ -604,20 +739,14 @@ def format_italic(text):
     Returns:
         text (str): Formatted text in standard markdown
     """
-    italics_pattern1 = r"''(.+?)''"
-    # Matches only if : doesn't preceed //, to avoid formatting https:// as italic
-    italics_pattern2 = r'(?<!:)//(.+?)//'
-    match = re.findall(italics_pattern1, text) + re.findall(italics_pattern2, text)
-
-    for m in match:
-        replacement = r'*\1*'
-        text = re.sub(italics_pattern1, replacement, text, 1)
-        text = re.sub(italics_pattern2, replacement, text, 1)
+    replacement = r'*\1*'
+    text = _ITALIC_QUOTES_RE.sub(replacement, text)
+    text = _ITALIC_SLASHES_RE.sub(replacement, text)
 
     return text
 
 
-def format_code_blocks(text):
+def format_code_blocks(text: str) -> str:
     """
     Formats simple code blocks and code with language 
     identifiers for SQL, HTML, C#, Python, and XML.
@@ -640,19 +769,15 @@ def format_code_blocks(text):
     Returns:
         text (str): Formatted text in standard markdown
     """
-    text = re.sub(r'\s*\{\{\{\s*#!sql', '\n``` sql', text)
-    text = re.sub(r'\s*\{\{\{\s*#!html', '\n``` html', text)
-    text = re.sub(r'\s*\{\{\{\s*#!c#', '\n``` c#', text)
-    text = re.sub(r'\s*\{\{\{\s*#!python', '\n``` python', text)
-    text = re.sub(r'\s*\{\{\{\s*#!xml', '\n``` xml', text)
+    text = _CODE_LANGUAGE_RE.sub('\n``` \\1', text)
 
-    text = re.sub(r'\{\{\{', '```', text)
-    text = re.sub(r'\}\}\}', '```', text)
+    text = _CODE_OPEN_RE.sub('```', text)
+    text = _CODE_CLOSE_RE.sub('```', text)
         
     return text
 
 
-def format_horizontal_rule(text):
+def format_horizontal_rule(text: str) -> str:
     """
     Formats horizontal rule.
 
@@ -665,14 +790,13 @@ def format_horizontal_rule(text):
     Returns:etl
         text (str): Formatted text in standard markdown
     """
-    horizontal_line_pattern = r'^\s*-----*\s*$'
     replacement = '\n----'
-    text = re.sub(horizontal_line_pattern, replacement, text, re.MULTILINE)
+    text = _HORIZONTAL_RE.sub(replacement, text)
 
     return text
 
 
-def format_headers(text):
+def format_headers(text: str) -> str:
     """
     Formats headers 1 to header 4 in provided text string. 
 
@@ -685,42 +809,24 @@ def format_headers(text):
     Returns:
         text (str): Formatted text in standard markdown
     """
-    header_1_pattern = r'^= ([^=]+)\s?=?\s*(#.+)?$'
-    header_2_pattern = r'^== ([^=]+)\s?={0,2}\s*(#.+)?$'
-    header_3_pattern = r'^=== ([^=]+)\s?={0,3}\s*(#.+)?$'
-    header_4_pattern = r'^==== ([^=]+)\s?={0,4}\s*(#.+)?$'
-
-    match = re.findall(header_4_pattern, text, re.MULTILINE)
-    for m in match:
-        replacement = r'#### \1\n'
-        text = re.sub(header_4_pattern, replacement, text, 1, re.MULTILINE)
-
-    match = re.findall(header_3_pattern, text, re.MULTILINE)
-    for m in match:
-        replacement = r'### \1\n'
-        text = re.sub(header_3_pattern, replacement, text, 1, re.MULTILINE)
-
-    match = re.findall(header_2_pattern, text, re.MULTILINE)
-    for m in match:
-        replacement = r'## \1\n'
-        text = re.sub(header_2_pattern, replacement, text, 1, re.MULTILINE)
-
-    match = re.findall(header_1_pattern, text, re.MULTILINE)
-    for m in match:
-        replacement = r'# \1\n'
-        text = re.sub(header_1_pattern, replacement, text, 1, re.MULTILINE)
+    text = _HEADER_RE.sub(lambda m: f'{"#" * len(m.group(1))} {m.group(2)}\n', text)
 
     return text
 
 
-def get_attachments_and_paths(wikis, env, format_only=False):
+def get_attachments_and_paths(
+    wikis: Iterable[Union[str, Wiki]],
+    connection: sqlite3.Connection,
+    attachments_dir: str,
+    format_only: bool = False,
+) -> tuple[dict[str, list[str]], dict[str, str]]:
     """
     Helper method for keeping track of all attachments
     per wiki and their respective paths in the database.
     
-    First gets all Attachment objects for each wiki and 
-    stores them in wiki_attachments, which is used to 
-    keep track of remaining non-image attachments.
+    First gets the attachments of all wikis with a single
+    query and stores them in wiki_attachments, which is used
+    to keep track of remaining non-image attachments.
     
     Then gets the path of each attachment and stores it in
     attachment_path, which is used to copy the attachment
@@ -728,165 +834,348 @@ def get_attachments_and_paths(wikis, env, format_only=False):
 
     Args:
         wikis (list): List of all Wiki objects
-        env (trac.env.Environment): Trac Environment object
+        connection (sqlite3.Connection): Connection to the Trac database
+        attachments_dir (str): Path to the attachments folder of the Trac environment
 
     Returns:
         wiki_attachments (dict of {str : list}): List of all attachments for each wiki
         attachment_path (dict of {str : str}): Path to each attachment
     """
-    wiki_attachments = {}
-    attachment_path = {}
+    wiki_attachments: dict[str, list[str]] = {}
+    attachment_path: dict[str, str] = {}
 
     for wiki in wikis:
         if format_only:
-            wiki_name = wiki
+            wiki_name = cast(str, wiki)
         else:
             wiki_name = wiki[0]
             
         wiki_attachments[wiki_name] = []
 
-        for a in trac.attachment.Attachment.select(env, 'wiki', wiki_name):
-            filename = ' '.join(a.title.split(' ')[1:])
-            wiki_attachments[wiki_name].append(filename)
-            attachment_path[filename] = a.path
+    attachments_query = """
+        select id, filename
+        from attachment
+        where type = 'wiki'
+        order by time
+    """
+
+    for wiki_name, filename in connection.execute(attachments_query):
+        if wiki_name not in wiki_attachments:
+            continue
+
+        wiki_attachments[wiki_name].append(filename)
+        attachment_path[filename] = trac.attachment.Attachment._get_path(
+            attachments_dir, 'wiki', wiki_name, filename
+        )
 
     return wiki_attachments, attachment_path
 
 
-def get_specific_wiki(env_path, wiki_name):
+def _connect(db_path: str) -> sqlite3.Connection:
+    """
+    Opens a connection to the Trac database, tuned for reading.
+
+    Only read-side pragmas are set, since the script never writes
+    to the database. Switching journal mode to WAL would persist
+    in the backup file, so it's left as is.
+
+    Args:
+        db_path (str): Path to the Trac database
+
+    Returns:
+        connection (sqlite3.Connection): Connection to the database
+    """
+    connection = sqlite3.connect(db_path)
+    connection.executescript("""
+        pragma cache_size = -65536;
+        pragma temp_store = memory;
+        pragma mmap_size = 268435456;
+    """)
+
+    return connection
+
+
+def get_specific_wiki(connection: sqlite3.Connection, wiki_name: str) -> list[Wiki]:
     """
     Returns the Wiki object with the specified name
     as a tuple containing name, max version, and text.
 
     Args:
-        env_path (str): Path to Trac environment
+        connection (sqlite3.Connection): Connection to the Trac database
         wiki_name (str): Full name of the wiki page
     
     Returns:
         wiki (tuple(str, str, str)): Wiki object
     """
-    database_connection = sqlite3.connect(f'{env_path}\\db\\trac.db')
-    cursor = database_connection.cursor()
+    cursor = connection.cursor()
 
-    wiki_query = f"""
+    wiki_query = """
         select name, max(version) as version, text
         from wiki
-        where name = '{wiki_name}'
+        where name = ?
     """
 
-    wiki = cursor.execute(wiki_query).fetchall()
+    wiki = cursor.execute(wiki_query, (wiki_name,)).fetchall()
 
     return wiki
 
 
-def get_all_wikis(env_path, date, ignored_wikis):
+def _get_trac_timestamp(date: str) -> int:
+    """
+    Converts a date in format %Y-%m-%d to a Trac
+    timestamp, in microseconds since the epoch.
+    """
+    return int(datetime.datetime.strptime(date, r'%Y-%m-%d').timestamp() * (10**6))
+
+
+def _get_ignored_wikis_pattern(ignored_wikis: list[str]) -> re.Pattern[str]:
+    """
+    Compiles all ignored wiki patterns into one regex, so each
+    wiki name is matched once. Each pattern is in its own group
+    named pattern_<index>, to report which one matched.
+
+    Names must be normalized with os.path.normcase before
+    matching, the same way fnmatch.fnmatch does it.
+    """
+    return re.compile('|'.join(
+        f'(?P<pattern_{i}>{fnmatch.translate(os.path.normcase(ignored_wiki))})'
+        for i, ignored_wiki in enumerate(ignored_wikis)
+    ))
+
+
+def get_all_wiki_names(connection: sqlite3.Connection, date: str, ignored_wikis: list[str]) -> list[str]:
     """
-    Returns all Wiki objects after the specified date
-    as tuples containing name, max version, and text. 
-    Also returns a list of all wiki names, which is
-    used by some of the formatting methods.
+    Returns the names of all wikis after the specified date,
+    without their text. Used to look up the attachments
+    before the wikis are streamed by get_all_wikis.
 
     Args:
-        env_path (str): Path to Trac environment
+        connection (sqlite3.Connection): Connection to the Trac database
         date (str): Date to include wikis from, in format %Y-%m-%d
         ignored_wikis (list of str): Wikis to ignore
-    
+
     Returns:
-        wikis (list of tuple(str, str, str)): List of Wiki objects
+        wiki_names (list of str): List of wiki names
     """
-    database_connection = sqlite3.connect(f'{env_path}\\db\\trac.db')
-    cursor = database_connection.cursor()
+    cursor = connection.cursor()
 
-    trac_timestamp = int(datetime.datetime.strptime(date, r'%Y-%m-%d').timestamp() * (10**6))
+    trac_timestamp = _get_trac_timestamp(date)
 
-    wikis_query = f"""
+    wiki_names_query = """
         select
-            name, max(version) as version, text
+            name
         from
             wiki
         where 
-            time > {trac_timestamp}
+            time > ?
         group by name
         order by name
     """
 
-    wikis = cursor.execute(wikis_query).fetchall()
+    wiki_names = [wiki[0] for wiki in cursor.execute(wiki_names_query, (trac_timestamp,))]
 
-    print('Will handle ignoring of wiki pages.')
-    for ignored_wiki in ignored_wikis:
-        new_wikis = [wiki for wiki in wikis if not fnmatch.fnmatch(wiki[0], ignored_wiki)]
-        ignored_wikis = set(wikis) - set(new_wikis)
-        print(f'Will ignore following wiki pages because of pattern {ignored_wiki}:')
-        print('\n'.join([f' - {x[0]}' for x in ignored_wikis]))
-        wikis = new_wikis
+    if ignored_wikis:
+        ignored_wikis_pattern = _get_ignored_wikis_pattern(ignored_wikis)
+        wiki_names = [name for name in wiki_names if not ignored_wikis_pattern.match(os.path.normcase(name))]
+
+    return wiki_names
+
+
+def get_all_wikis(connection: sqlite3.Connection, date: str, ignored_wikis: list[str]) -> Iterator[Wiki]:
+    """
+    Yields all Wiki objects after the specified date
+    as tuples containing name, max version, and text.
+
+    The wikis are streamed from the database one at a time,
+    so the text of all wikis is never held in memory at once.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the Trac database
+        date (str): Date to include wikis from, in format %Y-%m-%d
+        ignored_wikis (list of str): Wikis to ignore
     
-    return wikis
+    Yields:
+        wiki (tuple(str, str, str)): Wiki object
+    """
+    cursor = connection.cursor()
 
+    trac_timestamp = _get_trac_timestamp(date)
 
-def format_all_wikis(env_path, wikis, wiki_attachments, attachment_path, new_wikis_folder, trac_link, docs_link, code_link):
+    wikis_query = """
+        select
+            name, max(version) as version, text
+        from
+            wiki
+        where 
+            time > ?
+        group by name
+        order by name
+    """
+
+    print('Will handle ignoring of wiki pages.')
+    ignored_wikis_pattern = _get_ignored_wikis_pattern(ignored_wikis) if ignored_wikis else None
+
+    for wiki in cursor.execute(wikis_query, (trac_timestamp,)):
+        m = ignored_wikis_pattern and ignored_wikis_pattern.match(os.path.normcase(wiki[0]))
+        if m:
+            ignored_wiki = ignored_wikis[int(cast(str, m.lastgroup).split('_')[1])]
+            print(f'Will ignore wiki page {wiki[0]} because of pattern {ignored_wiki}.')
+            continue
+
+        yield wiki
+
+
+# State of a formatting worker process, set once by _init_worker
+_worker_db_path = ''
+_worker_cursor: Optional[sqlite3.Cursor] = None
+# Related wikis often index the same title, so the worker keeps the subpages it has found
+_worker_subpages: dict[str, tuple[str, ...]] = {}
+_worker_attachment_path: dict[str, str] = {}
+
+
+def _init_worker(db_path: str, attachment_path: dict[str, str]) -> None:
+    """
+    Stores the state shared by all wikis in a formatting
+    worker process, so it is sent once per process
+    instead of once per wiki.
+
+    Args:
+        db_path (str): Path to the Trac database
+        attachment_path (dict of {str : str}): Path to each attachment
+    """
+    global _worker_db_path, _worker_attachment_path
+
+    _worker_db_path = db_path
+    _worker_attachment_path = attachment_path
+
+
+def _format_one(wiki: Wiki, attachments: list[str], new_wikis_folder: str, links: Links) -> str:
+    """
+    Calls all format functions for one wiki and then
+    saves the formatted wiki to the specified folder.
+    Runs in a worker process started by format_all_wikis.
+
+    Args:
+        wiki (tuple(str, str, str)): Wiki object containing name, max version, and text
+        attachments (list of str): Attachments of the wiki
+        new_wikis_folder (str): Path to folder for formatted wikis
+        links (Links): Your organization's Trac links
+
+    Returns:
+        wiki_name (str): Name of the formatted wiki
+    """
+    global _worker_cursor
+
+    # SQLite connections can't be shared between processes,
+    # so each worker opens its own the first time it's needed
+    if _worker_cursor is None:
+        _worker_cursor = _connect(_worker_db_path).cursor()
+
+    wiki_name = wiki[0]
+    text = wiki[2]
+
+    text = preprocessing(text)
+
+    # NOTE: Unordered lists must be called before italic
+    text = format_unordered_lists(text)
+
+    # NOTE: Regular links must be called before any other type of links
+    text = format_links(text)
+
+    text = format_title_index(text, _worker_cursor, links, _worker_subpages)
+    text = format_log_links(text, links)
+    text = format_source_docs(text, links)
+    text = format_references(text, links)
+    text = format_underline(text)
+    text = format_code_blocks(text)
+    text = format_horizontal_rule(text)
+    text = format_headers(text)
+    text = format_tables(text)
+
+    # NOTE: Bold must be called after tables; if done before, ''' in the regex should be replaced with **
+    text = format_bold(text)
+
+    # NOTE: Italic must be called after bold
+    text = format_italic(text)
+
+    # The attachments are copied while the wiki is post-processed and saved
+    copy_futures: list[concurrent.futures.Future[str]] = []
+    text, _ = format_attachments({wiki_name: attachments}, _worker_attachment_path, wiki_name, text, new_wikis_folder, copy_futures)
+
+    text = postprocessing(text)
+
+    file_path = os.path.join(new_wikis_folder, *wiki_name.split('/')) + '.md'
+    _ensure_dir(os.path.dirname(file_path))
+
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+    _wait_for_copies(copy_futures)
+
+    return wiki_name
+
+
+def format_all_wikis(
+    env_path: str,
+    wikis: Iterable[Wiki],
+    wiki_attachments: dict[str, list[str]],
+    attachment_path: dict[str, str],
+    new_wikis_folder: str,
+    links: Links,
+) -> None:
     """
     For each wiki, calls all format functions and then 
     saves the formatted wiki to the specified folder. 
+
+    The wikis are independent of each other, so they are
+    formatted in parallel, one worker process per CPU.
     
     Args:
         env_path (str): Path to the Trac environment
-        wikis (list of tuple(str, str, str)): List of Wiki objects containing
-                                              name, max version, and text
+        wikis (iterable of tuple(str, str, str)): Wiki objects containing
+                                                  name, max version, and text
         wiki_attachments (dict of {str : list}): List of all attachments 
                                                  for each wiki
         attachment_path (dict of {str : str}): Path to each attachment
         new_wikis_folder (str): Path to folder for formatted wikis
-        trac_link (str): Your organization's base Trac link
-        docs_link (str): Your organization's Trac docs link
-        code_link (str): Your organization's Trac code link
+        links (Links): Your organization's Trac links
     
     Returns:
         None
     """
-    for wiki in wikis:
-        text = wiki[2]
-
-        text = preprocessing(text)
-
-        # NOTE: Unordered lists must be called before italic
-        text = format_unordered_lists(text)
-
-        # NOTE: Regular links must be called before any other type of links
-        text = format_links(text)
+    db_path = os.path.join(env_path, 'db', 'trac.db')
 
-        text = format_title_index(text, env_path, trac_link)
-        text = format_log_links(text, code_link)
-        text = format_source_docs(text, docs_link)
-        text = format_source_links(text, trac_link)
-        text = format_ticket_links(text, trac_link)
-        text = format_report_links(text, trac_link)
-        text = format_wiki_links(text, trac_link)
-        text = format_underline(text)
-        text = format_code_blocks(text)
-        text = format_horizontal_rule(text)
-        text = format_headers(text)
-        text = format_tables(text)
-
-        # NOTE: Bold must be called after tables; if done before, ''' in the regex should be replaced with **
-        text = format_bold(text)
+    format_wiki = functools.partial(
+        _format_one,
+        new_wikis_folder=new_wikis_folder,
+        links=links,
+    )
 
-        # NOTE: Italic must be called after bold
-        text = format_italic(text)
+    # A bounded number of wikis is kept in flight and topped up as each one
+    # is formatted, so the stream is never read into memory all at once
+    # and the workers don't wait for a whole batch to finish
+    max_pending = (os.cpu_count() or 1) * 4
+    pending: set[concurrent.futures.Future[str]] = set()
+    formatted_count = 0
 
-        text, wiki_attachments = format_attachments(wiki_attachments, attachment_path, wiki_name, text)
+    with concurrent.futures.ProcessPoolExecutor(initializer=_init_worker, initargs=(db_path, attachment_path)) as executor:
+        for wiki in wikis:
+            if len(pending) >= max_pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    formatted_count += 1
 
-        text = postprocessing(text)
+            pending.add(executor.submit(format_wiki, wiki, wiki_attachments.get(wiki[0], [])))
 
-        wiki_name = wiki_name.replace('/', '\\')
-        
-        file_path = new_wikis_folder + f'\\{wiki_name}.md'
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        for future in concurrent.futures.as_completed(pending):
+            future.result()
+            formatted_count += 1
 
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.write(text)
+    print(f'Formatted {formatted_count} wikis.')
 
 
-def main():
+def main() -> None:
     parser = argparse.ArgumentParser()
 
     parser.add_argument(
@@ -931,20 +1220,24 @@ def main():
 
     ignored_wikis = getattr(config, 'ignored_wikis', [])
     
-    trac_link = config.trac_link
-    docs_link = config.docs_link
-    code_link = config.code_link
+    # The base urls are the same for every wiki, so they are built only once
+    links = Links.from_config(config.trac_link, config.docs_link, config.code_link)
 
     wiki_name = args.wiki_name
-    
-    if wiki_name is not None:
-        wikis = get_specific_wiki(env_path, wiki_name)
-    else:
-        wikis = get_all_wikis(env_path, date, ignored_wikis)
+    wikis: Iterable[Wiki]
 
-    wiki_attachments, attachment_path = get_attachments_and_paths(wikis, env)
+    # One connection is shared by all queries of the main process
+    with contextlib.closing(_connect(os.path.join(env_path, 'db', 'trac.db'))) as connection:
+        if wiki_name is not None:
+            wikis = get_specific_wiki(connection, wiki_name)
+            wiki_attachments, attachment_path = get_attachments_and_paths(wikis, connection, env.attachments_dir)
+        else:
+            # The wikis are streamed, so their attachments are looked up by name beforehand
+            wiki_names = get_all_wiki_names(connection, date, ignored_wikis)
+            wiki_attachments, attachment_path = get_attachments_and_paths(wiki_names, connection, env.attachments_dir, format_only=True)
+            wikis = get_all_wikis(connection, date, ignored_wikis)
 
-    format_all_wikis(env_path, wikis, wiki_attachments, attachment_path, new_wikis_folder, trac_link, docs_link, code_link)
+        format_all_wikis(env_path, wikis, wiki_attachments, attachment_path, new_wikis_folder, links)
 
 
 if __name__ == '__main__':